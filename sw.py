@@ -2,14 +2,21 @@ import streamlit as st
 # Must call set_page_config() as the very first Streamlit command.
 st.set_page_config(page_title="Professional Inventory Management", layout="wide")
 
+import io
 import os
-from datetime import datetime
-import pytz  # For IST conversion
+from datetime import datetime, timedelta, timezone
 import sqlite3
+import threading
+import time
 import hashlib
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import hmac
+
+# All stored timestamps are IST. India has no DST, so a fixed UTC offset is
+# exact and avoids a zone lookup on every write.
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+
+# pandas and reportlab are imported inside the pages/functions that use them,
+# so reruns that never build a table or PDF don't pay for loading them.
 
 # Barcode functionality removed in this version.
 barcode_scanner_enabled = False
@@ -23,8 +30,7 @@ st.sidebar.image(logo_url, width=150)
 # --------------------------------------------------------------------
 # Custom CSS for a Vibrant, Official Look with Emojis
 # --------------------------------------------------------------------
-st.markdown(
-    """
+_CSS = """
     <style>
     @import url('https://fonts.googleapis.com/css2?family=Pacifico&display=swap');
     body { background-color: #f0f8ff; }
@@ -33,342 +39,611 @@ st.markdown(
     .big-font { font-size: 24px !important; color: #2F4F4F; }
     .low-stock { color: #D32F2F; font-weight: bold; font-size: 20px; }
     </style>
-    """,
-    unsafe_allow_html=True,
-)
+    """
+
+# The style block never changes, so build it once; Streamlit replays the cached
+# element on later reruns instead of re-running the call.
+@st.cache_resource
+def _inject_css():
+    return st.markdown(_CSS, unsafe_allow_html=True)
+
+_inject_css()
 
 # --------------------------------------------------------------------
-# Helper Function to Hash Text
+# Helper Functions to Hash and Check PINs
 # --------------------------------------------------------------------
+# PINs are stored as "scrypt$<salt hex>$<hash hex>" with a random salt per
+# user. Rows written before that hold a bare SHA-256 digest; they still verify,
+# and authenticate() rehashes them with scrypt on the next successful login.
 def hash_text(text):
-    return hashlib.sha256(text.encode()).hexdigest()
+    # Legacy unsalted digest, only used to check PINs stored before scrypt
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _scrypt(pin, salt):
+    return hashlib.scrypt(pin.encode("utf-8"), salt=salt, n=16384, r=8, p=1, dklen=32)
+
+def hash_pin(pin):
+    salt = os.urandom(16)
+    return f"scrypt${salt.hex()}${_scrypt(pin, salt).hex()}"
+
+def verify_pin(pin, stored):
+    # Both comparisons are constant-time
+    if stored.startswith("scrypt$"):
+        _, salt, digest = stored.split("$")
+        return hmac.compare_digest(_scrypt(pin, bytes.fromhex(salt)).hex(), digest)
+    return hmac.compare_digest(stored, hash_text(pin))
+
+# Hashed against when the username doesn't exist, so that a failed login
+# takes as long as a wrong PIN and doesn't reveal which names are taken
+_DUMMY_SALT = bytes(16)
 
 # --------------------------------------------------------------------
-# Database Connection Helper
+# Schema Update for Vendors Table
 # --------------------------------------------------------------------
-def get_db_connection():
-    return sqlite3.connect("inventory.db", check_same_thread=False)
+def update_vendor_schema(db):
+    columns = [row["name"] for row in db.execute("PRAGMA table_info(vendors)").fetchall()]
+    with db:
+        if "quantity_bought" not in columns:
+            db.execute("ALTER TABLE vendors ADD COLUMN quantity_bought INTEGER")
+        if "points" not in columns:
+            db.execute("ALTER TABLE vendors ADD COLUMN points TEXT")
 
 # --------------------------------------------------------------------
-# DATABASE SETUP
+# NOCASE Name Columns
 # --------------------------------------------------------------------
-conn = sqlite3.connect("inventory.db", check_same_thread=False)
-c = conn.cursor()
-
-# Users table (staff approval removed)
-c.execute(
-    """
-    CREATE TABLE IF NOT EXISTS users (
+# users.name and categories.name are declared COLLATE NOCASE so their UNIQUE
+# indexes serve case-insensitive lookups directly (and "Tools"/"tools" can't
+# both exist). {table} lets the same definition build the migration copy.
+USERS_COLUMNS = ("id", "name", "role", "pin")
+USERS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL UNIQUE COLLATE NOCASE,
         role TEXT NOT NULL,
         pin TEXT NOT NULL
     )
-    """
-)
-conn.commit()
-
-# login_log table to record every successful login
-c.execute(
-    """
-    CREATE TABLE IF NOT EXISTS login_log (
+"""
+CATEGORIES_COLUMNS = ("id", "name")
+CATEGORIES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        username TEXT NOT NULL,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users(id)
+        name TEXT UNIQUE NOT NULL COLLATE NOCASE
     )
-    """
-)
-conn.commit()
-
-# Insert default users if table is empty: 2 admins and 2 staff
-c.execute("SELECT COUNT(*) FROM users")
-if c.fetchone()[0] == 0:
-    c.execute("INSERT INTO users (name, role, pin) VALUES (?, ?, ?)", ("Admin1", "admin", hash_text("admin1pass")))
-    c.execute("INSERT INTO users (name, role, pin) VALUES (?, ?, ?)", ("Admin2", "admin", hash_text("admin2pass")))
-    c.execute("INSERT INTO users (name, role, pin) VALUES (?, ?, ?)", ("Staff1", "staff", hash_text("staff1pass")))
-    c.execute("INSERT INTO users (name, role, pin) VALUES (?, ?, ?)", ("Staff2", "staff", hash_text("staff2pass")))
-    conn.commit()
-
-# Categories table
-c.execute(
-    """
-    CREATE TABLE IF NOT EXISTS categories (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT UNIQUE NOT NULL
+"""
+
+def migrate_name_collation(db, table, table_sql, columns):
+    # One-time rebuild of a table created before name was declared NOCASE.
+    # Skipped if the old table's columns aren't exactly the expected ones (an
+    # older schema with extra or missing columns is left untouched rather
+    # than losing data) or if existing names collide once case is ignored.
+    row = db.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    if "COLLATE NOCASE" in row["sql"].upper():
+        return True
+    existing = {col["name"] for col in db.execute(f"PRAGMA table_info({table})")}
+    if existing != set(columns):
+        return False
+    clash = db.execute(
+        f"SELECT 1 FROM {table} GROUP BY name COLLATE NOCASE HAVING COUNT(*) > 1 LIMIT 1"
+    ).fetchone()
+    if clash:
+        return False
+    with db:
+        db.execute("BEGIN")
+        # The copy would restart AUTOINCREMENT from the largest surviving id,
+        # handing a deleted row's id (and its log/transaction history) to the
+        # next insert, so the old high-water mark is carried over
+        seq = db.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,)).fetchone()
+        db.execute(table_sql.format(table=f"{table}_new"))
+        # Copy by name, not position, in case the old columns are ordered differently
+        column_list = ", ".join(columns)
+        db.execute(f"INSERT INTO {table}_new ({column_list}) SELECT {column_list} FROM {table}")
+        db.execute(f"DROP TABLE {table}")
+        db.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        if seq:
+            db.execute("DELETE FROM sqlite_sequence WHERE name=?", (table,))
+            db.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, seq["seq"]))
+    return True
+
+# --------------------------------------------------------------------
+# DATABASE SETUP
+# --------------------------------------------------------------------
+def create_unique_index(db, index, table, columns):
+    # Returns False, creating nothing, if existing rows already hold duplicates
+    try:
+        db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table}({columns})")
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+def init_db(db):
+    c = db.cursor()
+
+    # Users table (staff approval removed)
+    c.execute(USERS_TABLE_SQL.format(table="users"))
+    if migrate_name_collation(db, "users", USERS_TABLE_SQL, USERS_COLUMNS):
+        c.execute("DROP INDEX IF EXISTS idx_users_name_nocase")
+    else:
+        # Fall back to a separate NOCASE index for case-insensitive lookups
+        c.execute("CREATE INDEX IF NOT EXISTS idx_users_name_nocase ON users(name COLLATE NOCASE)")
+    db.commit()
+
+    # login_log table to record every successful login
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS login_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        """
     )
-    """
-)
+    db.commit()
 
-# Items table (barcode removed)
-c.execute(
-    """
-    CREATE TABLE IF NOT EXISTS items (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        category TEXT NOT NULL,
-        name TEXT NOT NULL,
-        quantity INTEGER NOT NULL,
-        threshold INTEGER NOT NULL,
-        FOREIGN KEY (category) REFERENCES categories(name)
+    # Insert default users if table is empty: 2 admins and 2 staff
+    c.execute("SELECT COUNT(*) FROM users")
+    if c.fetchone()[0] == 0:
+        with db:
+            db.executemany(
+                "INSERT INTO users (name, role, pin) VALUES (?, ?, ?)",
+                [
+                    ("Admin1", "admin", hash_pin("admin1pass")),
+                    ("Admin2", "admin", hash_pin("admin2pass")),
+                    ("Staff1", "staff", hash_pin("staff1pass")),
+                    ("Staff2", "staff", hash_pin("staff2pass")),
+                ],
+            )
+
+    # Categories table
+    c.execute(CATEGORIES_TABLE_SQL.format(table="categories"))
+    migrate_name_collation(db, "categories", CATEGORIES_TABLE_SQL, CATEGORIES_COLUMNS)
+
+    # Items table (barcode removed)
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,
+            name TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            threshold INTEGER NOT NULL,
+            FOREIGN KEY (category) REFERENCES categories(name)
+        )
+        """
+    )
+    # Partial covering index holding only the low-stock rows: a column-to-column
+    # comparison can't seek a plain (quantity, threshold) index, but the alert
+    # query can be answered by scanning just these entries.
+    c.execute("DROP INDEX IF EXISTS idx_items_lowstock")
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_items_low_stock ON items(quantity, threshold, name) "
+        "WHERE quantity < threshold"
     )
-    """
-)
 
-# Transactions table to log item take events
-c.execute(
-    """
-    CREATE TABLE IF NOT EXISTS transactions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        item_id INTEGER NOT NULL,
-        quantity_taken INTEGER NOT NULL,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users(id),
-        FOREIGN KEY (item_id) REFERENCES items(id)
+    # Transactions table to log item take events
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity_taken INTEGER NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (item_id) REFERENCES items(id)
+        )
+        """
     )
-    """
-)
 
-# Vendors table (initial schema)
-c.execute(
-    """
-    CREATE TABLE IF NOT EXISTS vendors (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        vendor_name TEXT NOT NULL,
-        contact TEXT,
-        item_supplied TEXT,
-        address TEXT,
-        points TEXT
+    # Vendors table (initial schema)
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vendors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vendor_name TEXT NOT NULL,
+            contact TEXT,
+            item_supplied TEXT,
+            address TEXT,
+            points TEXT
+        )
+        """
     )
-    """
-)
-conn.commit()
+
+    # One item name per category and one row per vendor name. The (category,
+    # name) index also serves the category filter, so the plain category index
+    # is only needed when duplicates left over from before block the unique one.
+    if create_unique_index(db, "ux_items_cat_name", "items", "category, name"):
+        c.execute("DROP INDEX IF EXISTS idx_items_category")
+    else:
+        c.execute("CREATE INDEX IF NOT EXISTS idx_items_category ON items(category)")
+    create_unique_index(db, "ux_vendors_name", "vendors", "vendor_name")
+
+    # Indexes for the timestamp-ordered log/transaction views
+    c.execute("CREATE INDEX IF NOT EXISTS idx_login_log_ts ON login_log(timestamp DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tx_ts ON transactions(timestamp DESC)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tx_user ON transactions(user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tx_item ON transactions(item_id, timestamp)")
+    db.commit()
+
+    update_vendor_schema(db)
+
+# A single connection is shared by every session and rerun of this server
+# process (Streamlit re-executes this script on each interaction, so a plain
+# module-level connect would reopen the database every time). The schema is
+# set up once, when the connection is first created, and the handle is closed
+# if the entry is ever dropped from the cache (e.g. "Clear cache").
+def close_conn(db):
+    # Let SQLite refresh planner statistics for the tables this connection
+    # queried before closing it, as its docs recommend. Other sessions may
+    # still be using the connection, so wait for the lock first.
+    with db_lock:
+        db.execute("PRAGMA optimize")
+        db.close()
+
+@st.cache_resource(on_release=close_conn)
+def get_conn():
+    db = sqlite3.connect("inventory.db", check_same_thread=False, cached_statements=256)
+    # Only takes effect when the file is new, and has to precede the switch to WAL
+    db.execute("PRAGMA page_size=8192")
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
+    db.execute("PRAGMA mmap_size=268435456")  # 256 MB memory-mapped reads
+    # Rows support access by column name (row["quantity"]) as well as by position
+    db.row_factory = sqlite3.Row
+    init_db(db)
+    # 0x10000 also checks tables this connection hasn't queried yet (SQLite
+    # 3.46+; older versions ignore the bit and only analyse what needs it)
+    db.execute("PRAGMA optimize=0x10002")
+    return db
+
+# Sessions run on separate threads; this lock keeps one session's statements
+# from landing inside another session's open transaction on the shared connection.
+@st.cache_resource
+def get_db_lock():
+    return threading.RLock()
+
+conn = get_conn()
+db_lock = get_db_lock()
+
+# The connection lives as long as the server process, so planner statistics
+# are also refreshed hourly (a no-op when nothing has changed much). This
+# script's globals are rebuilt on every rerun, so the time of the last run is
+# kept in a process-wide dict, shared the same way as the lock.
+OPTIMIZE_INTERVAL = 3600  # seconds
+
+@st.cache_resource
+def get_optimize_state():
+    # get_conn() has just optimised, so the first refresh is due an interval later
+    return {"last_run": time.monotonic()}
+
+def optimize_db():
+    state = get_optimize_state()
+    with db_lock:
+        if time.monotonic() - state["last_run"] >= OPTIMIZE_INTERVAL:
+            conn.execute("PRAGMA optimize")
+            state["last_run"] = time.monotonic()
+
+optimize_db()
 
 # --------------------------------------------------------------------
-# Schema Update for Vendors Table
+# Data Version Tokens (invalidate the cached reads below on every write)
 # --------------------------------------------------------------------
-def update_vendor_schema():
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("PRAGMA table_info(vendors)")
-    columns = [row[1] for row in c2.fetchall()]
-    if "quantity_bought" not in columns:
-        c2.execute("ALTER TABLE vendors ADD COLUMN quantity_bought INTEGER")
-    if "points" not in columns:
-        c2.execute("ALTER TABLE vendors ADD COLUMN points TEXT")
-    conn2.commit()
-    conn2.close()
+# Every write in this process goes through the shared connection and bumps a
+# process-wide counter, so all sessions see it on their next rerun. Logins only
+# add to the login log, so they bump a counter of their own and don't make
+# every session reload items, users and vendors. PRAGMA data_version changes
+# only when another connection commits, which catches writes made outside this
+# process. The start time keeps tokens from repeating if the counters are
+# recreated (e.g. "Clear cache").
+@st.cache_resource
+def get_write_counters():
+    return {"started": time.time_ns(), "data": 0, "login_log": 0}
+
+def get_db_version():
+    counters = get_write_counters()
+    with db_lock:
+        external = conn.execute("PRAGMA data_version").fetchone()[0]
+    return external, counters["started"], counters["data"]
+
+def get_login_log_version():
+    # A data reset clears the login log as well
+    return get_db_version() + (get_write_counters()["login_log"],)
+
+def bump_db_version(counter="data"):
+    counters = get_write_counters()
+    with db_lock:
+        counters[counter] += 1
 
-update_vendor_schema()
+# --------------------------------------------------------------------
+# SQL for the hot helpers, kept as constants so every call hands sqlite3 the
+# same text and hits the connection's prepared-statement cache.
+# --------------------------------------------------------------------
+# COLLATE NOCASE keeps logins case-insensitive even where the users table
+# couldn't be migrated (idx_users_name_nocase serves it then). Names differing
+# only by case can only exist in that case; the exact spelling wins.
+_SQL_AUTH = (
+    "SELECT id, name, role, pin FROM users WHERE name = ? COLLATE NOCASE "
+    "ORDER BY name = ? COLLATE BINARY DESC, id LIMIT 1"
+)
+# The column default (CURRENT_TIMESTAMP) is UTC while every stored timestamp
+# is IST; IST has no DST, so SQLite can stamp it with a fixed offset
+_SQL_INSERT_LOGIN_LOG = (
+    "INSERT INTO login_log (user_id, username, timestamp) "
+    "VALUES (?, ?, datetime('now', '+5 hours', '+30 minutes'))"
+)
+_SQL_GET_LOW_STOCK = "SELECT name, quantity, threshold FROM items WHERE quantity < threshold"
+_SQL_UPDATE_ITEM_QTY = "UPDATE items SET quantity=? WHERE id=?"
+_SQL_TAKE_ITEM = "UPDATE items SET quantity = quantity - ? WHERE id = ? AND quantity >= ? RETURNING quantity"
+_SQL_INSERT_TX = "INSERT INTO transactions (user_id, item_id, quantity_taken, timestamp) VALUES (?, ?, ?, ?)"
+_SQL_GET_USERS = "SELECT id, name, role FROM users"
+# Every item with whoever last took it and when, in one query (the window runs
+# over idx_tx_item) instead of one lookup per item
+_SQL_GET_ITEMS_WITH_LAST_TXN = """
+    SELECT i.id, i.category, i.name, i.quantity, i.threshold,
+           COALESCE(u.name, '-'), COALESCE(t.timestamp, '-')
+    FROM items i
+    LEFT JOIN (
+        SELECT item_id, user_id, timestamp,
+               ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY timestamp DESC) AS rn
+        FROM transactions
+    ) t ON t.item_id = i.id AND t.rn = 1
+    LEFT JOIN users u ON u.id = t.user_id
+"""
+# quantity_bought and points were added by ALTER TABLE, so their position
+# differs between databases; name the columns in the order the page shows them
+_SQL_GET_VENDORS = (
+    "SELECT id, vendor_name, contact, item_supplied, address, quantity_bought, points FROM vendors"
+)
+# A negative LIMIT means no limit in SQLite
+_SQL_GET_LOGIN_LOG = "SELECT id, user_id, username, timestamp FROM login_log ORDER BY timestamp DESC LIMIT ?"
+# Timestamps are stored as "YYYY-MM-DD HH:MM:SS" strings, so comparing them
+# as text is a date comparison and can range-scan idx_tx_ts
+_SQL_GET_TRANSACTIONS = """
+    SELECT t.id, u.name, i.name, t.quantity_taken, t.timestamp 
+    FROM transactions t 
+    JOIN users u ON t.user_id = u.id 
+    JOIN items i ON t.item_id = i.id 
+    WHERE t.timestamp >= ?
+    ORDER BY t.timestamp DESC
+    LIMIT ?
+"""
 
 # --------------------------------------------------------------------
 # Additional Helper Functions for Logging
 # --------------------------------------------------------------------
 def add_login_log(user_id, username):
-    # Use IST timestamp for login log
-    ist = pytz.timezone('Asia/Kolkata')
-    ts = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S")
-    conn2 = sqlite3.connect("inventory.db", check_same_thread=False)
-    c2 = conn2.cursor()
-    c2.execute("INSERT INTO login_log (user_id, username, timestamp) VALUES (?, ?, ?)", (user_id, username, ts))
-    conn2.commit()
-    conn2.close()
+    # No commit here: authenticate() calls this inside its own transaction
+    conn.execute(_SQL_INSERT_LOGIN_LOG, (user_id, username))
 
 # --------------------------------------------------------------------
 # Other Helper Functions (Categories, Items, Users, Transactions, Vendors)
 # --------------------------------------------------------------------
 def authenticate(username, pin):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    hashed = hash_text(pin)
-    c2.execute("SELECT id, role FROM users WHERE name=? AND pin=?", (username, hashed))
-    row = c2.fetchone()
-    conn2.close()
-    if row:
-        return row[1]
-    return None
+    # Look up the user by name (an index probe), then check the PIN outside
+    # the lock: scrypt takes tens of milliseconds and would otherwise stall
+    # every other session's queries. The lock is taken again only to upgrade
+    # a legacy SHA-256 PIN hash to scrypt and record the login. Names match
+    # case-insensitively, so the stored spelling is returned as well.
+    # Returns (user_id, name, role), or None if the credentials don't match.
+    if not username or not pin:
+        return None
+    with db_lock:
+        row = conn.execute(_SQL_AUTH, (username, username)).fetchone()
+    if row is None:
+        _scrypt(pin, _DUMMY_SALT)
+        return None
+    if not verify_pin(pin, row["pin"]):
+        return None
+    new_hash = None if row["pin"].startswith("scrypt$") else hash_pin(pin)
+    with db_lock, conn:
+        if new_hash:
+            # Leaves the PIN alone if it was changed since it was read
+            conn.execute("UPDATE users SET pin=? WHERE id=? AND pin=?", (new_hash, row["id"], row["pin"]))
+        add_login_log(row["id"], row["name"])
+    bump_db_version("login_log")
+    return row["id"], row["name"], row["role"]
 
 def add_category(name):
     if not name.strip():
         st.error("Please enter a valid category name.")
         return False
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
     try:
-        c2.execute("INSERT INTO categories (name) VALUES (?)", (name.strip(),))
-        conn2.commit()
-        conn2.close()
+        with db_lock, conn:
+            conn.execute("INSERT INTO categories (name) VALUES (?)", (name.strip(),))
+        bump_db_version()
+        # Categories are shared by every session, so drop the cached list outright
+        _cached_get_categories.clear()
         return True
     except sqlite3.IntegrityError:
         st.error("Category already exists.")
-        conn2.close()
         return False
 
 def get_categories():
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("SELECT name FROM categories")
-    cats = [row[0] for row in c2.fetchall()]
-    conn2.close()
-    return cats
+    with db_lock:
+        return [row["name"] for row in conn.execute("SELECT name FROM categories").fetchall()]
 
-def add_item(category, name, quantity, vendor, threshold):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
+def add_items(rows):
+    # rows: list of (category, name, quantity, threshold), inserted in one
+    # transaction. If any name already exists in its category, none are added.
     try:
-        c2.execute("INSERT INTO items (category, name, quantity, threshold) VALUES (?, ?, ?, ?)",
-                   (category, name, quantity, threshold))
-        conn2.commit()
-        conn2.close()
+        with db_lock, conn:
+            conn.executemany("INSERT INTO items (category, name, quantity, threshold) VALUES (?, ?, ?, ?)", rows)
+        bump_db_version()
         return True
     except sqlite3.IntegrityError:
         st.error("Item already exists.")
-        conn2.close()
         return False
 
-def get_items():
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("SELECT * FROM items")
-    items = c2.fetchall()
-    conn2.close()
-    return items
+def add_item(category, name, quantity, vendor, threshold):
+    return add_items([(category, name, quantity, threshold)])
 
 def get_items_by_category(category):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("SELECT id, name, quantity, threshold FROM items WHERE category=?", (category,))
-    items = c2.fetchall()
-    conn2.close()
-    return items
+    with db_lock:
+        return conn.execute("SELECT id, name, quantity, threshold FROM items WHERE category=?", (category,)).fetchall()
+
+def get_low_stock_items():
+    with db_lock:
+        return conn.execute(_SQL_GET_LOW_STOCK).fetchall()
 
 def update_item_quantity(item_id, quantity):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("UPDATE items SET quantity=? WHERE id=?", (quantity, item_id))
-    conn2.commit()
-    conn2.close()
+    with db_lock, conn:
+        conn.execute(_SQL_UPDATE_ITEM_QTY, (quantity, item_id))
+    bump_db_version()
 
 def delete_item(item_id):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("DELETE FROM items WHERE id=?", (item_id,))
-    conn2.commit()
-    conn2.close()
+    with db_lock, conn:
+        conn.execute("DELETE FROM items WHERE id=?", (item_id,))
+    bump_db_version()
 
-def add_user(name, role, pin):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
+def add_users(rows):
+    # rows: iterable of (name, role, pin), inserted in one transaction. The
+    # PINs are hashed before the lock is taken.
+    hashed = [(name, role, hash_pin(pin)) for name, role, pin in rows]
     try:
-        c2.execute("INSERT INTO users (name, role, pin) VALUES (?, ?, ?)", (name, role, hash_text(pin)))
-        conn2.commit()
-        conn2.close()
+        with db_lock, conn:
+            conn.executemany("INSERT INTO users (name, role, pin) VALUES (?, ?, ?)", hashed)
+        bump_db_version()
         return True
     except sqlite3.IntegrityError:
         st.error("User already exists or username is taken.")
-        conn2.close()
         return False
 
-def get_users():
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("SELECT id, name, role FROM users")
-    users = c2.fetchall()
-    conn2.close()
-    return users
+def add_user(name, role, pin):
+    return add_users([(name, role, pin)])
+
+def delete_users(user_ids):
+    # Removes all the given users in one transaction
+    with db_lock, conn:
+        conn.executemany("DELETE FROM users WHERE id=?", [(user_id,) for user_id in user_ids])
+    bump_db_version()
 
 def delete_user(user_id):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("DELETE FROM users WHERE id=?", (user_id,))
-    conn2.commit()
-    conn2.close()
-
-def get_user_by_username(username):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("SELECT id, name, role FROM users WHERE LOWER(name)=LOWER(?)", (username,))
-    user = c2.fetchone()
-    conn2.close()
-    return user
+    delete_users([user_id])
 
 def update_user_credentials(user_id, new_name, new_pin):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("UPDATE users SET name=?, pin=? WHERE id=?", (new_name, hash_text(new_pin), user_id))
-    conn2.commit()
-    conn2.close()
-
-def add_transaction(user_id, item_id, quantity_taken):
-    # Record IST timestamp (UTC+5:30)
-    ist = pytz.timezone('Asia/Kolkata')
-    ts = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S")
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("INSERT INTO transactions (user_id, item_id, quantity_taken, timestamp) VALUES (?, ?, ?, ?)",
-               (user_id, item_id, quantity_taken, ts))
-    conn2.commit()
-    conn2.close()
-
-def get_transactions():
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute(
-        """
-        SELECT t.id, u.name, i.name, t.quantity_taken, t.timestamp 
-        FROM transactions t 
-        JOIN users u ON t.user_id = u.id 
-        JOIN items i ON t.item_id = i.id 
-        ORDER BY t.timestamp DESC
-        """
+    # Names are unique ignoring case, so this also fails for "admin1" when
+    # "Admin1" is someone else's. No row is updated if an admin deleted the
+    # user after they logged in.
+    pin_hash = hash_pin(new_pin)
+    try:
+        with db_lock, conn:
+            cur = conn.execute("UPDATE users SET name=?, pin=? WHERE id=?", (new_name, pin_hash, user_id))
+    except sqlite3.IntegrityError:
+        st.error("Username already exists.")
+        return False
+    if cur.rowcount != 1:
+        st.error("User not found.")
+        return False
+    bump_db_version()
+    return True
+
+def take_item(user_id, item_id, quantity_taken):
+    # Decrement stock and log the transaction in one transaction. The stock
+    # check lives in the UPDATE itself, so concurrent takes can't oversell.
+    # Returns the new quantity, or None if there wasn't enough stock.
+    ts = datetime.now(IST).strftime("%Y-%m-%d %H:%M:%S")
+    with db_lock, conn:
+        row = conn.execute(_SQL_TAKE_ITEM, (quantity_taken, item_id, quantity_taken)).fetchone()
+        if row is None:
+            return None
+        conn.execute(_SQL_INSERT_TX, (user_id, item_id, quantity_taken, ts))
+    bump_db_version()
+    return row["quantity"]
+
+def get_transactions(limit=-1, since=""):
+    with db_lock:
+        return conn.execute(_SQL_GET_TRANSACTIONS, (since, limit)).fetchall()
+
+# --------------------------------------------------------------------
+# Cached Reads (keyed on a data version token; the ttl and max_entries bound
+# how long and how many stale versions each cache keeps). st.cache_data
+# pickles its results and sqlite3.Row can't be pickled, so rows come back as
+# tuples (or dicts where the page reads columns by name).
+# --------------------------------------------------------------------
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_get_items_by_category(token, category):
+    return [dict(row) for row in get_items_by_category(category)]
+
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_get_low_stock_items(token):
+    return [tuple(row) for row in get_low_stock_items()]
+
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_get_categories(token):
+    return get_categories()
+
+# The admin tables are shown as DataFrames, so those are cached as frames read
+# straight from the query; reruns then skip pandas as well as SQLite. Columns
+# are Arrow-backed, which is also what st.dataframe serialises to.
+def read_frame(sql, params, columns):
+    import pandas as pd
+    with db_lock:
+        df = pd.read_sql_query(sql, conn, params=params, dtype_backend="pyarrow")
+    df.columns = columns
+    return df
+
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_inventory_frame(token):
+    # The integer columns are read as int64; int32 is plenty for them
+    return read_frame(
+        _SQL_GET_ITEMS_WITH_LAST_TXN, (),
+        ["ID", "Category", "Item Name", "Quantity", "Threshold", "Last Taken By", "Last Taken At"]
+    ).astype({"ID": "int32[pyarrow]", "Quantity": "int32[pyarrow]", "Threshold": "int32[pyarrow]"})
+
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_users_frame(token):
+    return read_frame(_SQL_GET_USERS, (), ["User ID", "Username", "Role"])
+
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_vendors_frame(token):
+    return read_frame(
+        _SQL_GET_VENDORS, (),
+        ["ID", "Vendor Name", "Contact", "Item Supplied", "Address", "Quantity Bought", "Points"]
     )
-    trans = c2.fetchall()
-    conn2.close()
-    return trans
-
-def get_last_transaction_for_item(item_id):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute(
-        """
-        SELECT u.name, t.timestamp 
-        FROM transactions t 
-        JOIN users u ON t.user_id = u.id 
-        WHERE t.item_id = ? 
-        ORDER BY t.timestamp DESC 
-        LIMIT 1
-        """, (item_id,)
+
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_transactions_frame(token, limit=-1):
+    return read_frame(
+        _SQL_GET_TRANSACTIONS, ("", limit),
+        ["Trans ID", "User", "Item", "Quantity Taken", "Timestamp"]
     )
-    result = c2.fetchone()
-    conn2.close()
-    return result
+
+@st.cache_data(ttl=5, max_entries=64, show_spinner=False)
+def _cached_login_log_frame(token, limit=-1):
+    return read_frame(_SQL_GET_LOGIN_LOG, (limit,), ["Log ID", "User ID", "Username", "Timestamp"])
 
 def generate_report_pdf(report_type):
-    txs = get_transactions()
-    filtered = []
-    now = datetime.now()
-    if report_type == "instant":
-        filtered = txs
+    # Transactions are timestamped in IST, so the cutoff is computed in IST too.
+    # Rolling windows start on a whole minute, so repeat clicks within that
+    # minute (with no new data) reuse the cached PDF.
+    now = datetime.now(IST)
+    if report_type == "daily":
+        cutoff = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif report_type in ("weekly", "monthly", "yearly"):
+        cutoff = now - timedelta(days={"weekly": 7, "monthly": 30, "yearly": 365}[report_type])
+        cutoff = cutoff.replace(second=0, microsecond=0)
     else:
-        for tx in txs:
-            tx_time = datetime.strptime(tx[4], "%Y-%m-%d %H:%M:%S")
-            if report_type == "daily" and tx_time.date() == now.date():
-                filtered.append(tx)
-            elif report_type == "weekly" and (now - tx_time).days < 7:
-                filtered.append(tx)
-            elif report_type == "monthly" and (now - tx_time).days < 30:
-                filtered.append(tx)
-            elif report_type == "yearly" and (now - tx_time).days < 365:
-                filtered.append(tx)
-    if not filtered:
+        cutoff = None
+    since = cutoff.strftime("%Y-%m-%d %H:%M:%S") if cutoff else ""
+    report = _cached_report_pdf(get_db_version(), report_type, since)
+    if report is None:
         st.error("No transactions found for the selected period.")
+    return report
+
+@st.cache_data(ttl=300, max_entries=16, show_spinner=False)
+def _cached_report_pdf(token, report_type, since):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    filtered = get_transactions(since=since)
+    if not filtered:
         return None
-    # Create DataFrame and add serial numbering starting from 1
-    df_tx = pd.DataFrame(filtered, columns=["Trans ID", "User", "Item", "Quantity Taken", "Timestamp"])
-    df_tx.insert(0, "S.No", range(1, len(df_tx) + 1))
-    filename = f"inventory_report_{report_type}_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
-    cpdf = canvas.Canvas(filename, pagesize=letter)
+    filename = f"inventory_report_{report_type}_{datetime.now(IST).strftime('%Y%m%d_%H%M%S')}.pdf"
+    # Render into memory; the bytes go straight to st.download_button
+    buf = io.BytesIO()
+    cpdf = canvas.Canvas(buf, pagesize=letter, pageCompression=1)
     width, height = letter
     cpdf.setFont("Helvetica-Bold", 20)
     cpdf.drawString(50, height - 50, f"Inventory Report - {report_type.capitalize()} Report 😊")
@@ -379,130 +654,136 @@ def generate_report_pdf(report_type):
     for i, header in enumerate(headers):
         cpdf.drawString(x_positions[i], y, header)
     y -= 20
-    cpdf.setFont("Helvetica", 10)
-    for index, row in df_tx.iterrows():
+    # Draw rows straight from the query results, numbering them from 1. All
+    # cells on a page go into one text object (drawString would open a new
+    # text block with its own font setup for every cell).
+    text = cpdf.beginText()
+    text.setFont("Helvetica", 10)
+    for sno, tx in enumerate(filtered, start=1):
         if y < 50:
+            cpdf.drawText(text)
             cpdf.showPage()
             y = height - 50
-        for i, val in enumerate(row):
-            cpdf.drawString(x_positions[i], y, str(val))
+            text = cpdf.beginText()
+            text.setFont("Helvetica", 10)
+        for x, val in zip(x_positions, (sno,) + tuple(tx)):
+            text.setTextOrigin(x, y)
+            text.textOut(str(val))
         y -= 15
+    cpdf.drawText(text)
     cpdf.save()
-    return filename
+    return filename, buf.getvalue()
 
 # ---------------- Vendor Management Functions ----------------
 def add_vendor(vendor_name, contact, item_supplied, address, quantity_bought, points):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
     try:
-        c2.execute(
-            "INSERT INTO vendors (vendor_name, contact, item_supplied, address, quantity_bought, points) VALUES (?, ?, ?, ?, ?, ?)",
-            (vendor_name, contact, item_supplied, address, quantity_bought, points)
-        )
-        conn2.commit()
-        conn2.close()
+        with db_lock, conn:
+            conn.execute(
+                "INSERT INTO vendors (vendor_name, contact, item_supplied, address, quantity_bought, points) VALUES (?, ?, ?, ?, ?, ?)",
+                (vendor_name, contact, item_supplied, address, quantity_bought, points)
+            )
+        bump_db_version()
         return True
     except sqlite3.OperationalError as e:
         st.error(f"Operational error: {e}")
-        conn2.close()
         return False
     except sqlite3.IntegrityError:
         st.error("Vendor may already exist.")
-        conn2.close()
         return False
 
-def get_vendors():
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("SELECT * FROM vendors")
-    vendors = c2.fetchall()
-    conn2.close()
-    return vendors
-
 def delete_vendor(vendor_id):
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("DELETE FROM vendors WHERE id=?", (vendor_id,))
-    conn2.commit()
-    conn2.close()
+    with db_lock, conn:
+        conn.execute("DELETE FROM vendors WHERE id=?", (vendor_id,))
+    bump_db_version()
 
 # ---------------- Data Recovery & Reset Function ----------------
-def backup_and_reset_data():
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    # Gather data from tables (excluding users)
-    c2.execute("SELECT * FROM categories")
-    categories = c2.fetchall()
-    c2.execute("SELECT * FROM items")
-    items = c2.fetchall()
-    c2.execute("SELECT * FROM transactions")
-    transactions = c2.fetchall()
-    c2.execute("SELECT * FROM vendors")
-    vendors = c2.fetchall()
-    c2.execute("SELECT * FROM login_log")
-    login_logs = c2.fetchall()
-    conn2.close()
-    
-    filename = f"data_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    pdf = canvas.Canvas(filename, pagesize=letter)
+# Tables exported and cleared by a reset (users are kept)
+BACKUP_TABLES = [
+    ("Categories", "categories"),
+    ("Items", "items"),
+    ("Transactions", "transactions"),
+    ("Vendors", "vendors"),
+    ("Login Logs", "login_log"),
+]
+
+def render_backup_pdf(sections):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=letter, pageCompression=1)
     width, height = letter
     y = height - 40
     pdf.setFont("Helvetica-Bold", 16)
     pdf.drawString(50, y, "Complete Data Backup Report")
     y -= 30
-    sections = [
-        ("Categories", categories),
-        ("Items", items),
-        ("Transactions", transactions),
-        ("Vendors", vendors),
-        ("Login Logs", login_logs)
-    ]
+    # As in generate_report_pdf, each page's lines go into one text object
+    text = pdf.beginText()
     for section_title, data in sections:
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.drawString(50, y, f"{section_title}:")
+        text.setFont("Helvetica-Bold", 14)
+        text.setTextOrigin(50, y)
+        text.textOut(f"{section_title}:")
         y -= 20
-        pdf.setFont("Helvetica", 10)
+        text.setFont("Helvetica", 10)
         if data:
             for row in data:
-                line = ", ".join(str(x) for x in row)
-                pdf.drawString(50, y, line)
+                text.setTextOrigin(50, y)
+                text.textOut(", ".join(str(x) for x in row))
                 y -= 15
                 if y < 50:
+                    pdf.drawText(text)
                     pdf.showPage()
                     y = height - 40
+                    text = pdf.beginText()
+                    text.setFont("Helvetica", 10)
         else:
-            pdf.drawString(50, y, "No records.")
+            text.setTextOrigin(50, y)
+            text.textOut("No records.")
             y -= 15
         y -= 10
+    pdf.drawText(text)
     pdf.save()
+    return buf.getvalue()
+
+def backup_and_reset_data():
+    filename = f"data_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    # Export and delete inside one write transaction: BEGIN IMMEDIATE takes
+    # SQLite's write lock up front, so nothing can be committed between the
+    # export and the delete and then be lost unexported. If the PDF can't be
+    # rendered or saved, the delete is rolled back along with it.
+    with db_lock, conn:
+        conn.execute("BEGIN IMMEDIATE")
+        sections = [
+            (title, conn.execute(f"SELECT * FROM {table}").fetchall())
+            for title, table in BACKUP_TABLES
+        ]
+        pdf_bytes = render_backup_pdf(sections)
+        # Keep a copy on the server as well, since the reset is destructive
+        with open(filename, "wb") as f:
+            f.write(pdf_bytes)
+        for _, table in BACKUP_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+    bump_db_version()
+    _cached_get_categories.clear()
     
-    # Reset data: delete all records from categories, items, transactions, vendors, login_log
-    conn2 = get_db_connection()
-    c2 = conn2.cursor()
-    c2.execute("DELETE FROM categories")
-    c2.execute("DELETE FROM items")
-    c2.execute("DELETE FROM transactions")
-    c2.execute("DELETE FROM vendors")
-    c2.execute("DELETE FROM login_log")
-    conn2.commit()
-    conn2.close()
-    
-    return filename
+    return filename, pdf_bytes
+
+# --------------------------------------------------------------------
+# Paging for the log tables: only the newest rows are fetched until the
+# user asks for more.
+# --------------------------------------------------------------------
+PAGE_SIZE = 500
+
+def get_page_limit(key):
+    return st.session_state.get(key, PAGE_SIZE)
+
+def show_more(key):
+    st.session_state[key] = get_page_limit(key) + PAGE_SIZE
 
 # --------------------------------------------------------------------
 # Display Low Stock Alerts
 # --------------------------------------------------------------------
 def display_low_stock_alerts():
-    items = get_items()
-    low_stock = []
-    for item in items:
-        try:
-            qty = int(item[3])
-            thresh = int(item[4])
-        except ValueError:
-            continue
-        if qty < thresh:
-            low_stock.append((item[2], qty, thresh))
+    low_stock = _cached_get_low_stock_items(get_db_version())
     if low_stock:
         st.sidebar.markdown("<div class='low-stock'><b>Low Stock Alerts ⚠️:</b></div>", unsafe_allow_html=True)
         for name, qty, thresh in low_stock:
@@ -513,6 +794,69 @@ def display_low_stock_alerts():
 # Call display_low_stock_alerts after defining all functions
 display_low_stock_alerts()
 
+# --------------------------------------------------------------------
+# Page Fragments: typing in or clicking these pages' widgets reruns only the
+# page body, not the sidebar and the rest of the script
+# --------------------------------------------------------------------
+@st.fragment
+def inventory_page():
+    st.markdown("<div class='header'>📋 Inventory Items</div>", unsafe_allow_html=True)
+    # Set by the Update/Delete buttons below before they rerun the app
+    notice = st.session_state.pop("inventory_notice", None)
+    if notice == "updated":
+        st.success("Quantity updated successfully.")
+    elif notice == "deleted":
+        st.warning("Item deleted.")
+    df_items = _cached_inventory_frame(get_db_version())
+    if not df_items.empty:
+        st.dataframe(df_items, hide_index=True)
+        st.markdown("<div class='subheader'>Update / Delete Items:</div>", unsafe_allow_html=True)
+        item_id_update = st.text_input("Enter Item ID for Update/Delete", placeholder="Enter item ID")
+        new_qty = st.number_input("New Quantity", min_value=0, step=1)
+        # A change can move an item in or out of the sidebar's low-stock
+        # alert, which is outside this fragment, so writes rerun the whole app
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Update Quantity"):
+                if item_id_update:
+                    update_item_quantity(int(item_id_update), new_qty)
+                    st.session_state.inventory_notice = "updated"
+                    st.rerun(scope="app")
+                else:
+                    st.error("Please enter an item ID.")
+        with col2:
+            if st.button("Delete Item"):
+                if item_id_update:
+                    delete_item(int(item_id_update))
+                    st.session_state.inventory_notice = "deleted"
+                    st.rerun(scope="app")
+                else:
+                    st.error("Please enter an item ID.")
+    else:
+        st.write("No items found.")
+
+@st.fragment
+def reports_page():
+    st.markdown("<div class='header'>📄 Reports</div>", unsafe_allow_html=True)
+    report_type = st.radio("Select Report Type", ["Instant", "Daily", "Weekly", "Monthly", "Yearly"])
+    if st.button("Generate PDF Report"):
+        report = generate_report_pdf(report_type.lower())
+        if report:
+            filename, pdf_bytes = report
+            st.success(f"PDF Report generated: {filename}")
+            st.download_button("Download Report", pdf_bytes, file_name=filename, mime="application/pdf")
+        else:
+            st.error("Report generation failed.")
+    st.markdown("<div class='subheader'>Transaction Log:</div>", unsafe_allow_html=True)
+    trans_limit = get_page_limit("trans_limit")
+    df_trans = _cached_transactions_frame(get_db_version(), trans_limit)
+    if not df_trans.empty:
+        st.dataframe(df_trans, hide_index=True)
+        if len(df_trans) == trans_limit:
+            st.button("Show more", key="trans_more", on_click=show_more, args=("trans_limit",))
+    else:
+        st.write("No transactions recorded yet.")
+
 # --------------------------------------------------------------------
 # LOGOUT BUTTON (Available in Sidebar)
 # --------------------------------------------------------------------
@@ -540,6 +884,7 @@ if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
     st.session_state.role = None
     st.session_state.username = ""
+    st.session_state.user_id = None
 
 if not st.session_state.logged_in:
     st.markdown("<div class='header'>🔐 Login</div>", unsafe_allow_html=True)
@@ -548,14 +893,10 @@ if not st.session_state.logged_in:
         pin = st.text_input("PIN", type="password", placeholder="Enter your PIN")
         submitted = st.form_submit_button("Login")
         if submitted:
-            role = authenticate(username, pin)
-            if role:
-                user_info = get_user_by_username(username)
-                if user_info:
-                    add_login_log(user_info[0], username)
+            user = authenticate(username, pin)
+            if user:
                 st.session_state.logged_in = True
-                st.session_state.role = role
-                st.session_state.username = username
+                st.session_state.user_id, st.session_state.username, st.session_state.role = user
             else:
                 st.error("❌ Invalid username or PIN. Please try again.")
     if not st.session_state.logged_in:
@@ -576,25 +917,19 @@ if nav == "Home":
 elif nav == "Entry Log":
     if st.session_state.role == "admin":
         st.markdown("<div class='header'>📜 Entry Log</div>", unsafe_allow_html=True)
-        def get_login_log():
-            conn2 = get_db_connection()
-            c2 = conn2.cursor()
-            c2.execute("SELECT id, user_id, username, timestamp FROM login_log ORDER BY timestamp DESC")
-            log_entries = c2.fetchall()
-            conn2.close()
-            return log_entries
-        log_entries = get_login_log()
-        if log_entries:
-            df_log = pd.DataFrame(log_entries, columns=["Log ID", "User ID", "Username", "Timestamp"])
-            st.table(df_log)
+        log_limit = get_page_limit("log_limit")
+        df_log = _cached_login_log_frame(get_login_log_version(), log_limit)
+        if not df_log.empty:
+            st.dataframe(df_log, hide_index=True)
+            if len(df_log) == log_limit:
+                st.button("Show more", key="log_more", on_click=show_more, args=("log_limit",))
         else:
             st.write("No login entries recorded yet.")
         if st.button("Save and Reset Log"):
-            pdf_filename = backup_and_reset_data()
-            if pdf_filename and os.path.exists(pdf_filename):
+            pdf_filename, pdf_bytes = backup_and_reset_data()
+            if pdf_bytes:
                 st.success(f"Log saved as {pdf_filename} and system reset successfully.")
-                with open(pdf_filename, "rb") as f:
-                    st.download_button("Download Log Backup PDF", f, file_name=pdf_filename)
+                st.download_button("Download Log Backup PDF", pdf_bytes, file_name=pdf_filename, mime="application/pdf")
             else:
                 st.error("Failed to save and reset log.")
     else:
@@ -608,11 +943,10 @@ elif nav == "Data Recovery & Reset":
         st.markdown("<div class='header'>🔄 Data Recovery & Reset</div>", unsafe_allow_html=True)
         st.write("This will backup all system data (except users) to a PDF and then reset the system.")
         if st.button("Backup Data & Reset System"):
-            backup_filename = backup_and_reset_data()
-            if backup_filename and os.path.exists(backup_filename):
+            backup_filename, backup_bytes = backup_and_reset_data()
+            if backup_bytes:
                 st.success(f"Data backed up as {backup_filename} and system reset successfully.")
-                with open(backup_filename, "rb") as f:
-                    st.download_button("Download Backup PDF", f, file_name=backup_filename)
+                st.download_button("Download Backup PDF", backup_bytes, file_name=backup_filename, mime="application/pdf")
             else:
                 st.error("Data backup and reset failed.")
     else:
@@ -628,9 +962,10 @@ elif nav == "Manage Categories":
         if add_category(new_category):
             st.success(f"Category '{new_category}' added successfully! 🎉")
     st.markdown("<div class='subheader'>Existing Categories:</div>", unsafe_allow_html=True)
-    cats = get_categories()
+    cats = _cached_get_categories(get_db_version())
     if cats:
-        st.table(pd.DataFrame(cats, columns=["Category Name"]))
+        import pandas as pd
+        st.dataframe(pd.DataFrame(cats, columns=["Category Name"]), hide_index=True)
     else:
         st.write("No categories available.")
 
@@ -639,7 +974,7 @@ elif nav == "Manage Categories":
 # --------------------------------------------------------------------
 elif nav == "Add Items":
     st.markdown("<div class='header'>📦 Add New Item</div>", unsafe_allow_html=True)
-    cats = get_categories()
+    cats = _cached_get_categories(get_db_version())
     if cats:
         category = st.selectbox("Select Category", cats)
         item_name = st.text_input("Item Name", placeholder="Enter item name")
@@ -674,13 +1009,12 @@ elif nav == "Vendor Management":
             else:
                 st.error("Please provide a valid vendor name.")
         st.markdown("<div class='subheader'>Existing Vendors:</div>", unsafe_allow_html=True)
-        vendors = get_vendors()
-        if vendors:
-            df_vendors = pd.DataFrame(vendors, columns=["ID", "Vendor Name", "Contact", "Item Supplied", "Address", "Quantity Bought", "Points"])
-            st.table(df_vendors)
-            for vendor in vendors:
-                if st.button(f"Delete Vendor {vendor[0]}", key=f"vendor_{vendor[0]}"):
-                    delete_vendor(vendor[0])
+        df_vendors = _cached_vendors_frame(get_db_version())
+        if not df_vendors.empty:
+            st.dataframe(df_vendors, hide_index=True)
+            for vendor_id in df_vendors["ID"].tolist():
+                if st.button(f"Delete Vendor {vendor_id}", key=f"vendor_{vendor_id}"):
+                    delete_vendor(vendor_id)
                     st.success("Vendor deleted! 🗑️")
         else:
             st.write("No vendors found.")
@@ -692,33 +1026,22 @@ elif nav == "Vendor Management":
 # --------------------------------------------------------------------
 elif nav == "Take Items" and st.session_state.role == "staff":
     st.markdown("<div class='header'>📦 Take Items</div>", unsafe_allow_html=True)
-    cats = get_categories()
+    cats = _cached_get_categories(get_db_version())
     if cats:
         selected_category = st.selectbox("Select Category", cats)
-        def get_items_by_category(category):
-            conn2 = get_db_connection()
-            c2 = conn2.cursor()
-            c2.execute("SELECT id, name, quantity, threshold FROM items WHERE category=?", (category,))
-            items = c2.fetchall()
-            conn2.close()
-            return items
-        items_in_cat = get_items_by_category(selected_category)
+        items_in_cat = _cached_get_items_by_category(get_db_version(), selected_category)
         if items_in_cat:
-            item_options = {f"{item[1]} (Qty: {item[2]})": item for item in items_in_cat}
+            item_options = {f"{item['name']} (Qty: {item['quantity']})": item for item in items_in_cat}
             selected_item_str = st.selectbox("Select Item", list(item_options.keys()))
             selected_item = item_options[selected_item_str]
-            st.write(f"Selected: {selected_item[1]} (Current Qty: {selected_item[2]}, Threshold: {selected_item[3]})")
-            take_qty = st.number_input("Quantity to take", min_value=1, max_value=selected_item[2], step=1)
+            st.write(f"Selected: {selected_item['name']} (Current Qty: {selected_item['quantity']}, Threshold: {selected_item['threshold']})")
+            take_qty = st.number_input("Quantity to take", min_value=1, max_value=selected_item["quantity"], step=1)
             if st.button("Take Item"):
-                new_qty = selected_item[2] - take_qty
-                if new_qty < 0:
+                new_qty = take_item(st.session_state.user_id, selected_item["id"], take_qty)
+                if new_qty is None:
                     st.error("Not enough stock available.")
                 else:
-                    update_item_quantity(selected_item[0], new_qty)
-                    current_user = get_user_by_username(st.session_state.username)
-                    if current_user:
-                        add_transaction(current_user[0], selected_item[0], take_qty)
-                    st.success(f"Took {take_qty} of {selected_item[1]}. New quantity: {new_qty}.")
+                    st.success(f"Took {take_qty} of {selected_item['name']}. New quantity: {new_qty}.")
         else:
             st.write("No items found in this category.")
     else:
@@ -728,44 +1051,7 @@ elif nav == "Take Items" and st.session_state.role == "staff":
 # VIEW INVENTORY (All)
 # --------------------------------------------------------------------
 elif nav == "View Inventory":
-    st.markdown("<div class='header'>📋 Inventory Items</div>", unsafe_allow_html=True)
-    items = get_items()
-    enhanced_items = []
-    # Each item row: (id, category, name, quantity, threshold)
-    for item in items:
-        item_fixed = item[:5]
-        last_txn = get_last_transaction_for_item(item_fixed[0])
-        if last_txn:
-            last_by, last_at = last_txn
-        else:
-            last_by, last_at = "-", "-"
-        enhanced_items.append(item_fixed + (last_by, last_at))
-    if enhanced_items:
-        df_items = pd.DataFrame(
-            enhanced_items,
-            columns=["ID", "Category", "Item Name", "Quantity", "Threshold", "Last Taken By", "Last Taken At"]
-        )
-        st.table(df_items)
-        st.markdown("<div class='subheader'>Update / Delete Items:</div>", unsafe_allow_html=True)
-        item_id_update = st.text_input("Enter Item ID for Update/Delete", placeholder="Enter item ID")
-        new_qty = st.number_input("New Quantity", min_value=0, step=1)
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("Update Quantity"):
-                if item_id_update:
-                    update_item_quantity(int(item_id_update), new_qty)
-                    st.success("Quantity updated successfully.")
-                else:
-                    st.error("Please enter an item ID.")
-        with col2:
-            if st.button("Delete Item"):
-                if item_id_update:
-                    delete_item(int(item_id_update))
-                    st.warning("Item deleted.")
-                else:
-                    st.error("Please enter an item ID.")
-    else:
-        st.write("No items found.")
+    inventory_page()
 
 # --------------------------------------------------------------------
 # USER MANAGEMENT (Admin Only)
@@ -784,14 +1070,22 @@ elif nav == "User Management":
             else:
                 st.error("Please enter valid user details.")
         st.markdown("<div class='subheader'>Existing Users:</div>", unsafe_allow_html=True)
-        users = get_users()
-        if users:
-            df_users = pd.DataFrame(users, columns=["User ID", "Username", "Role"])
-            st.table(df_users)
+        df_users = _cached_users_frame(get_db_version())
+        if not df_users.empty:
+            st.dataframe(df_users, hide_index=True)
+            users = list(df_users.itertuples(index=False, name=None))
             for user in users:
                 if st.button(f"Delete User {user[0]}", key=f"user_{user[0]}"):
                     delete_user(user[0])
                     st.success("User deleted! 🗑️")
+            user_labels = {user[0]: f"{user[1]} (ID {user[0]})" for user in users}
+            selected_ids = st.multiselect("Select users to delete", list(user_labels), format_func=user_labels.get)
+            if st.button("Delete Selected Users"):
+                if selected_ids:
+                    delete_users(selected_ids)
+                    st.success(f"{len(selected_ids)} user(s) deleted! 🗑️")
+                else:
+                    st.error("Please select at least one user.")
         else:
             st.write("No users found.")
     else:
@@ -802,38 +1096,7 @@ elif nav == "User Management":
 # --------------------------------------------------------------------
 elif nav == "Reports":
     if st.session_state.role == "admin":
-        st.markdown("<div class='header'>📄 Reports</div>", unsafe_allow_html=True)
-        report_type = st.radio("Select Report Type", ["Instant", "Daily", "Weekly", "Monthly", "Yearly"])
-        if st.button("Generate PDF Report"):
-            filename = generate_report_pdf(report_type.lower())
-            if filename and os.path.exists(filename):
-                st.success(f"PDF Report generated: {filename}")
-                with open(filename, "rb") as f:
-                    st.download_button("Download Report", f, file_name=filename)
-            else:
-                st.error("Report generation failed.")
-        st.markdown("<div class='subheader'>Transaction Log:</div>", unsafe_allow_html=True)
-        def get_transactions_display():
-            conn2 = get_db_connection()
-            c2 = conn2.cursor()
-            c2.execute(
-                """
-                SELECT t.id, u.name, i.name, t.quantity_taken, t.timestamp 
-                FROM transactions t 
-                JOIN users u ON t.user_id = u.id 
-                JOIN items i ON t.item_id = i.id 
-                ORDER BY t.timestamp DESC
-                """
-            )
-            trans = c2.fetchall()
-            conn2.close()
-            return trans
-        trans = get_transactions_display()
-        if trans:
-            df_trans = pd.DataFrame(trans, columns=["Trans ID", "User", "Item", "Quantity Taken", "Timestamp"])
-            st.table(df_trans)
-        else:
-            st.write("No transactions recorded yet.")
+        reports_page()
     else:
         st.error("Access denied. Admins only.")
 
@@ -842,34 +1105,18 @@ elif nav == "Reports":
 # --------------------------------------------------------------------
 elif nav == "Account Settings":
     st.markdown("<div class='header'>⚙️ Account Settings</div>", unsafe_allow_html=True)
-    def get_user_by_username_local(username):
-        conn2 = get_db_connection()
-        c2 = conn2.cursor()
-        c2.execute("SELECT id, name, role FROM users WHERE LOWER(name)=LOWER(?)", (username,))
-        user = c2.fetchone()
-        conn2.close()
-        return user
-    def update_user_credentials_local(user_id, new_name, new_pin):
-        conn2 = get_db_connection()
-        c2 = conn2.cursor()
-        c2.execute("UPDATE users SET name=?, pin=? WHERE id=?", (new_name, hash_text(new_pin), user_id))
-        conn2.commit()
-        conn2.close()
-    current_user = get_user_by_username_local(st.session_state.username)
-    if current_user:
-        st.markdown("<div class='subheader'>Update Your Credentials 🔧:</div>", unsafe_allow_html=True)
-        new_name = st.text_input("New Username", value=current_user[1])
-        new_pin = st.text_input("New PIN", type="password", placeholder="Enter new PIN")
-        confirm_pin = st.text_input("Confirm New PIN", type="password", placeholder="Re-enter new PIN")
-        if st.button("Update Credentials"):
-            if new_pin and new_pin == confirm_pin and new_name.strip() != "":
-                update_user_credentials_local(current_user[0], new_name, new_pin)
+    # The id and stored name were kept in the session at login
+    st.markdown("<div class='subheader'>Update Your Credentials 🔧:</div>", unsafe_allow_html=True)
+    new_name = st.text_input("New Username", value=st.session_state.username)
+    new_pin = st.text_input("New PIN", type="password", placeholder="Enter new PIN")
+    confirm_pin = st.text_input("Confirm New PIN", type="password", placeholder="Re-enter new PIN")
+    if st.button("Update Credentials"):
+        if new_pin and new_pin == confirm_pin and new_name.strip() != "":
+            if update_user_credentials(st.session_state.user_id, new_name, new_pin):
                 st.success("Credentials updated successfully! 🎉")
                 st.session_state.username = new_name
-            else:
-                st.error("Please ensure the PINs match and the username is valid.")
-    else:
-        st.error("User not found.")
+        else:
+            st.error("Please ensure the PINs match and the username is valid.")
 
 
 